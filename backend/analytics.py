@@ -0,0 +1,254 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+UNKNOWN = "Unknown"
+
+
+class DailySeries:
+    """Sorted per-day counts with running totals, so range sums are two binary searches."""
+
+    def __init__(self):
+        self.dates: List[str] = []
+        self.counts: List[int] = []
+        self.cumulative: List[int] = []
+
+    def add(self, day: str, amount: int = 1):
+        index = bisect_left(self.dates, day)
+        if index < len(self.dates) and self.dates[index] == day:
+            self.counts[index] += amount
+        else:
+            self.dates.insert(index, day)
+            self.counts.insert(index, amount)
+            self.cumulative.insert(index, 0)
+        # Attendance is recorded for today, so this is normally only the last entry
+        running = self.cumulative[index - 1] if index > 0 else 0
+        for i in range(index, len(self.dates)):
+            running += self.counts[i]
+            self.cumulative[i] = running
+
+    def _bounds(self, start: Optional[str], end: Optional[str]) -> Tuple[int, int]:
+        lo = bisect_left(self.dates, start) if start else 0
+        hi = bisect_right(self.dates, end) if end else len(self.dates)
+        return lo, hi
+
+    def total(self, start: Optional[str] = None, end: Optional[str] = None) -> int:
+        lo, hi = self._bounds(start, end)
+        if hi <= lo:
+            return 0
+        return self.cumulative[hi - 1] - (self.cumulative[lo - 1] if lo > 0 else 0)
+
+    def days(self, start: Optional[str] = None, end: Optional[str] = None) -> int:
+        lo, hi = self._bounds(start, end)
+        return max(0, hi - lo)
+
+    def items(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Tuple[str, int]]:
+        lo, hi = self._bounds(start, end)
+        return list(zip(self.dates[lo:hi], self.counts[lo:hi]))
+
+
+class AttendanceAnalytics:
+    """
+    Incremental attendance aggregates per student, per year/session group and per day.
+    Updated as attendance is recorded and rebuilt from the attendance table with backfill().
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.students: Dict[str, dict] = {}
+        self.student_dates: Dict[str, List[str]] = {}
+        self.student_first_seen: Dict[str, Dict[str, str]] = {}
+        self.group_days: Dict[Tuple[str, str], DailySeries] = {}
+        self.group_versions: Dict[Tuple[str, str], int] = {}
+        self.day_first_seen: Dict[str, str] = {}
+        self.daily_present = DailySeries()
+        self.group_first_seen: Dict[Tuple[str, str], Dict[str, str]] = {}
+        self.streak_cache: Dict[str, Tuple[int, dict]] = {}
+        self.last_backfill: Optional[str] = None
+
+    def register_student(self, student: dict):
+        student_id = str(student.get("id", ""))
+        if not student_id:
+            return
+        previous_group = self.group_of(student_id)
+        self.students[student_id] = {
+            "name": student.get("name", UNKNOWN),
+            "roll_number": student.get("roll_number", UNKNOWN),
+            "year": str(student.get("year") or UNKNOWN),
+            "session": str(student.get("session") or UNKNOWN),
+        }
+        if student_id in self.student_dates and self.group_of(student_id) != previous_group:
+            self._rebuild_groups()
+
+    def group_of(self, student_id: str) -> Tuple[str, str]:
+        student = self.students.get(student_id, {})
+        return student.get("year", UNKNOWN), student.get("session", UNKNOWN)
+
+    def record(self, student_id, day: str, time: Optional[str] = None) -> bool:
+        """Add one attendance record. Returns False if the student was already counted that day."""
+        student_id = str(student_id)
+        day = str(day)[:10]
+        time = time or ""
+        dates = self.student_dates.setdefault(student_id, [])
+        index = bisect_left(dates, day)
+        if index < len(dates) and dates[index] == day:
+            first_seen = self.student_first_seen[student_id]
+            if time and (not first_seen[day] or time < first_seen[day]):
+                first_seen[day] = time
+                self._update_first_seen(self.group_of(student_id), day, time)
+            return False
+
+        dates.insert(index, day)
+        self.student_first_seen.setdefault(student_id, {})[day] = time
+        self.daily_present.add(day)
+        self._add_to_group(self.group_of(student_id), day, time)
+        self.streak_cache.pop(student_id, None)
+        return True
+
+    def _update_first_seen(self, group: Tuple[str, str], day: str, time: str):
+        if not time:
+            return
+        for first_seen in (self.day_first_seen, self.group_first_seen.setdefault(group, {})):
+            if day not in first_seen or time < first_seen[day]:
+                first_seen[day] = time
+
+    def _add_to_group(self, group: Tuple[str, str], day: str, time: str):
+        series = self.group_days.setdefault(group, DailySeries())
+        if series.days(day, day) == 0:
+            # A new class day can break the streaks of everyone in the group
+            self.group_versions[group] = self.group_versions.get(group, 0) + 1
+        series.add(day)
+        self._update_first_seen(group, day, time)
+
+    def _rebuild_groups(self):
+        self.group_days = {}
+        self.group_versions = {}
+        self.group_first_seen = {}
+        self.streak_cache = {}
+        for student_id, dates in self.student_dates.items():
+            group = self.group_of(student_id)
+            for day in dates:
+                self._add_to_group(group, day, self.student_first_seen[student_id][day])
+
+    def backfill(self, students: List[dict], attendance: List[dict]):
+        """Rebuild every aggregate from full students and attendance tables."""
+        self.reset()
+        for student in students:
+            self.register_student(student)
+        for record in sorted(attendance, key=lambda r: (str(r.get("date", "")), str(r.get("time") or ""))):
+            if record.get("student_id") is None or not record.get("date"):
+                continue
+            self.record(record["student_id"], record["date"], record.get("time"))
+        self.last_backfill = datetime.now().isoformat()
+
+    def streaks(self, student_id: str) -> dict:
+        """Current and longest run of consecutive class days of the student's group attended."""
+        group = self.group_of(student_id)
+        version = self.group_versions.get(group, 0)
+        cached = self.streak_cache.get(student_id)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        attended = set(self.student_dates.get(student_id, []))
+        current = longest = 0
+        for day, _ in self.group_days.get(group, DailySeries()).items():
+            if day in attended:
+                current += 1
+                longest = max(longest, current)
+            else:
+                current = 0
+        result = {"current_streak": current, "longest_streak": longest}
+        self.streak_cache[student_id] = (version, result)
+        return result
+
+    def student_summary(self, student_id: str, start: Optional[str] = None, end: Optional[str] = None) -> dict:
+        student = self.students.get(student_id, {})
+        group = self.group_of(student_id)
+        dates = self.student_dates.get(student_id, [])
+        lo = bisect_left(dates, start) if start else 0
+        hi = bisect_right(dates, end) if end else len(dates)
+        present = max(0, hi - lo)
+        class_days = self.group_days.get(group, DailySeries()).days(start, end)
+        first_seen = self.student_first_seen.get(student_id, {})
+        return {
+            "student_id": student_id,
+            "name": student.get("name", UNKNOWN),
+            "roll_number": student.get("roll_number", UNKNOWN),
+            "year": group[0],
+            "session": group[1],
+            "present_days": present,
+            "class_days": class_days,
+            "attendance_percentage": round(present / class_days * 100, 1) if class_days else 0.0,
+            "first_seen": first_seen.get(dates[lo]) if present else None,
+            "last_seen": first_seen.get(dates[hi - 1]) if present else None,
+            **self.streaks(student_id),
+        }
+
+    def query(self, start: Optional[str] = None, end: Optional[str] = None,
+              year: Optional[str] = None, session: Optional[str] = None) -> dict:
+        """Attendance report for a date range, optionally limited to one year and/or session."""
+        groups = [
+            group for group in set(self.group_days) | {self.group_of(s) for s in self.students}
+            if (year is None or group[0] == year) and (session is None or group[1] == session)
+        ]
+
+        enrollment: Dict[Tuple[str, str], int] = {}
+        for student_id in self.students:
+            group = self.group_of(student_id)
+            enrollment[group] = enrollment.get(group, 0) + 1
+
+        session_summaries = []
+        for group in sorted(groups):
+            series = self.group_days.get(group, DailySeries())
+            enrolled = enrollment.get(group, 0)
+            class_days = series.days(start, end)
+            present = series.total(start, end)
+            session_summaries.append({
+                "year": group[0],
+                "session": group[1],
+                "enrolled_students": enrolled,
+                "class_days": class_days,
+                "total_present": present,
+                # Attendance for students missing from the students table has no enrollment to divide by
+                "attendance_percentage": None if not enrolled else (
+                    round(present / (enrolled * class_days) * 100, 1) if class_days else 0.0
+                ),
+            })
+
+        group_set = set(groups)
+        student_ids = {s for s in self.students if self.group_of(s) in group_set}
+        student_ids |= {s for s in self.student_dates if self.group_of(s) in group_set}
+        students = [self.student_summary(s, start, end) for s in student_ids]
+        students.sort(key=lambda s: s["roll_number"])
+
+        if year is None and session is None:
+            days = [
+                {"date": day, "total_present": count, "first_seen": self.day_first_seen.get(day)}
+                for day, count in self.daily_present.items(start, end)
+            ]
+        else:
+            per_day: Dict[str, dict] = {}
+            for group in groups:
+                group_first_seen = self.group_first_seen.get(group, {})
+                for day, count in self.group_days.get(group, DailySeries()).items(start, end):
+                    entry = per_day.setdefault(day, {"date": day, "total_present": 0, "first_seen": None})
+                    entry["total_present"] += count
+                    time = group_first_seen.get(day)
+                    if time and (entry["first_seen"] is None or time < entry["first_seen"]):
+                        entry["first_seen"] = time
+            days = [per_day[day] for day in sorted(per_day)]
+
+        total_present = sum(s["total_present"] for s in session_summaries)
+        return {
+            "summary": {
+                "total_students": len(students),
+                "total_days": len(days),
+                "total_present": total_present,
+                "average_daily_present": round(total_present / len(days), 1) if days else 0.0,
+            },
+            "sessions": session_summaries,
+            "students": students,
+            "days": days,
+        }